@@ -1,7 +1,5 @@
 import math
 
-math.log(10)
-
 
 def geometric_inverse_cdf(p: float, pin: float):
     log_1 = math.log1p(-p)
@@ -9,4 +7,5 @@ def geometric_inverse_cdf(p: float, pin: float):
     return math.ceil(log_1 / log_2)
 
 
-geometric_inverse_cdf(0.99, 0.91125 / 100)
+if __name__ == "__main__":
+    print(geometric_inverse_cdf(0.99, 0.91125 / 100))
@@ -2,13 +2,13 @@ import re
 import typer
 from rich.console import Console
 from rich.table import Table
-from collections import Counter
-from dataclasses import astuple
 
-from pypoe.socket_calcs import Item, ChromaticCalculator
-from pypoe.utils import RGB
+from pypoe.socket_calcs import Item, ChromaticCalculator, PERCENTILES
 from pypoe.body_armours import BASE_TYPES
 
+# a count followed by a color, e.g. the "3R" in "3R2G1B"
+_COLOR_RE = re.compile(r"(\d+)([RGB])")
+
 # app = typer.Typer()
 
 
@@ -22,7 +22,7 @@ def main(base: str, colors):
     _print_rich_table(calc.compute_chances())
 
 
-def _print_rich_table(list_results):
+def _print_rich_table(results):
     table = Table(
         title="Chromatic cost",
         caption=(
@@ -32,23 +32,30 @@ def _print_rich_table(list_results):
         ),
     )
 
-    for col in vars(list_results[0]).keys():
-        table.add_column(col)
+    table.add_column("name")
+    table.add_column("chance")
+    table.add_column("cost/try")
+    for q in PERCENTILES:
+        table.add_column(f"{q * 100:.0f}th")
 
-    for result in list_results:
-        table.add_row(*list(map(str, astuple(result))))
+    # format every column in one go, then assemble the rows
+    chance_col = [f"{c:.4g}" for c in results.chances.tolist()]
+    cost_col = results.costs_per_try.astype(str).tolist()
+    pct_cols = [[f"{v:.0f}" for v in row] for row in results.percentiles.tolist()]
+    for name, chance, cost, pcts in zip(results.names, chance_col, cost_col, pct_cols):
+        table.add_row(name, chance, cost, *pcts)
 
     console = Console()
     console.print(table)
 
 
 def _parse_colors(colors: str):
-    count = Counter(dict(zip("RGB", (0, 0, 0))))
-    split_ = re.findall(pattern=r"(\d)([RGB])", string=colors)
-    split_ = [(j, int(i)) for i, j in split_]
-    count.update(dict(split_))
+    # e.g. "3R2G1B" => [3, 2, 1]
+    count = [0, 0, 0]
+    for n, color in _COLOR_RE.findall(colors):
+        count["RGB".index(color)] += int(n)
 
-    return list(count.values())
+    return count
 
 
 if __name__ == "__main__":
@@ -6,16 +6,14 @@ E.g. compute the chance to get off colors, etc.
 
 
 import math
+from functools import lru_cache
 from itertools import repeat, combinations_with_replacement
 from collections import Counter
 from dataclasses import dataclass
-from toolz import pipe, curry
-from toolz.curried import map, filter, get, sorted
 
 import numpy as np
-from scipy.stats import multinomial, geom
 
-from .utils import delfn, RGB
+from .utils import format_bench
 
 rng = np.random.default_rng()  # no seed, we want "true" randomness
 
@@ -29,6 +27,96 @@ CHROMATIC_COSTS = {
     (0, 0, 3): 120,
 }
 
+# Percentiles of the number of tries reported for every crafting option
+PERCENTILES = np.array([0.5, 0.66, 0.80, 0.9, 0.95, 0.99])
+# position of each percentile (by name) in `PERCENTILES`
+_PCT_IDX = {"50": 0, "66": 1, "80": 2, "90": 3, "95": 4, "99": 5}
+
+
+def _build_bench_options():
+    """All the crafting bench options (plus the bare chromatic orb) as color modifiers."""
+    options = []
+    # the 3 possible colors and the "null" color as 0, to get combinations like 1R.
+    # use combinatorics to get all possible combinations of 3 elements
+    # this will give tuples like ('r', 'r', '0') => 2R
+    for combination in combinations_with_replacement("rgb0", r=3):
+        # use counter to reduce combinations to (r, g, b) counts, the "null" color is dropped
+        # e.g. ('r', 'r', 'g') => (2, 1, 0)
+        counts = Counter(combination)
+        option = (counts["r"], counts["g"], counts["b"])
+        # filter out the 1R1G1B combination, which doesn't exist for bench crafts (man, I wish)
+        if option == (1, 1, 1):
+            continue
+        options.append(option)
+    return options
+
+
+# The bench options never change, so build them (and their modifiers and costs
+# as arrays) once at import time.
+_BENCH_OPTIONS: tuple[tuple[int, int, int], ...] = tuple(_build_bench_options())
+# the modifiers as a (n_options, 3) integer matrix, so the multinomial PMF can be
+# evaluated for every bench option in a single call
+_BENCH_MOD_ARRAY = np.asarray(_BENCH_OPTIONS, dtype=np.int64)
+_BENCH_NAMES = tuple(format_bench(o) for o in _BENCH_OPTIONS)
+_BENCH_COSTS = np.asarray([CHROMATIC_COSTS[tuple(sorted(o))] for o in _BENCH_OPTIONS])
+_BENCH_COSTS.setflags(write=False)
+
+# Items have at most 6 sockets, so every outcome the multinomial deals with is some
+# (x1, x2, x3) adding up to 6 or less
+MAX_SOCKETS = 6
+
+
+def _build_multinomial_coefficients():
+    """Table with n! / (x1! x2! x3!) at [x1, x2, x3], for x1 + x2 + x3 = n <= `MAX_SOCKETS`."""
+    coef = np.zeros((MAX_SOCKETS + 1,) * 3, dtype=np.float64)
+    for x1 in range(MAX_SOCKETS + 1):
+        for x2 in range(MAX_SOCKETS + 1 - x1):
+            for x3 in range(MAX_SOCKETS + 1 - x1 - x2):
+                coef[x1, x2, x3] = math.factorial(x1 + x2 + x3) / (
+                    math.factorial(x1) * math.factorial(x2) * math.factorial(x3)
+                )
+    return coef
+
+
+# so all their multinomial coefficients fit in a small table
+_MULTINOM_COEF = _build_multinomial_coefficients()
+
+
+def _multinomial_pmf(x, n, p):
+    """Multinomial PMF for every row of `x` (with `n[i]` trials).
+
+    This is `scipy.stats.multinomial.pmf` specialized for our tiny problem (3 colors,
+    at most `MAX_SOCKETS` trials): a coefficient lookup and three integer powers,
+    without scipy's per-call validation overhead and with 0 (instead of NaN) for
+    impossible outcomes such as negative counts.
+    """
+    valid = (x >= 0).all(axis=1) & (x.sum(axis=1) == n)
+    # impossible rows are evaluated on a dummy all-zeros outcome and discarded afterwards
+    x = np.where(valid[:, None], x, 0)
+    pmf = _MULTINOM_COEF[x[:, 0], x[:, 1], x[:, 2]] * np.power(p, x).prod(axis=1)
+    return np.where(valid, pmf, 0.0)
+
+
+def geom_sf(x, p):
+    """Survival function of the geometric distribution, P(X > x) = (1 - p) ** x,
+    computed in log space so it stays accurate for tiny `p`."""
+    return np.exp(np.log1p(-p) * x)
+
+
+def geom_ppf(q, p):
+    """Inverse CDF of the geometric distribution: the number of trials needed to get
+    the first success with probability `q`, when each one succeeds with probability `p`.
+
+    Uses the closed form ceil(log(1 - q) / log(1 - p)). `log1p` avoids the catastrophic
+    cancellation of `1 - p` when `p` is tiny, as happens with 6 off-color sockets.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vals = np.ceil(np.log1p(-q) / np.log1p(-p))
+        # rounding may leave the ratio right above an integer, so `ceil` overshoots by one
+        vals = np.where((vals > 1) & (geom_sf(vals - 1, p) <= 1 - q), vals - 1, vals)
+    # a sure thing (chance of 1) still takes one try
+    return np.maximum(vals, 1)
+
 
 @dataclass
 class Item:
@@ -46,21 +134,11 @@ class Item:
             yield e
 
     def __post_init__(self):
-        self.n_req = pipe(
-            self,  # hopefully this triggers __iter__
-            filter(lambda x: x > 0),
-            list,
-            len,
-        )
+        self.n_req = (self.str_req > 0) + (self.dex_req > 0) + (self.int_req > 0)
 
     def __repr__(self):
-        _attrs = pipe(
-            self,
-            filter(lambda x: x > 0),
-            map(str),
-            lambda x: zip(x, ("Str", "Dex", "Int")),
-            map(lambda x: " ".join(x)),
-            tuple,
+        _attrs = tuple(
+            f"{v} {name}" for v, name in zip(self, ("Str", "Dex", "Int")) if v > 0
         )
         return f"Requires {', '.join(_attrs)}, has {self.n_sockets}/{self.max_sockets} sockets"
 
@@ -70,49 +148,84 @@ class ChromaticResult:
     name: str
     success_probability_single_trial: float
     cost_per_try: int
-    percentiles: dict
+    percentiles: np.ndarray  # number of tries, in the same order as `PERCENTILES`
 
     def cost(self, at_percentile: str = "66"):
-        return self.percentiles[at_percentile] * self.cost_per_try
+        return self.percentiles[_PCT_IDX[at_percentile]] * self.cost_per_try
 
     def __after_init__(self):
-        for pct, p_val in self.percentiles.items():
-            setattr(self, f"cost{pct}", p_val * self.cost_per_try)
+        for pct, idx in _PCT_IDX.items():
+            setattr(self, f"cost{pct}", self.percentiles[idx] * self.cost_per_try)
+
+
+@dataclass
+class ChromaticResults:
+    """Results for several crafting options, stored column-wise: the i-th entry of
+    every field belongs to the same option."""
+
+    names: list[str]
+    chances: np.ndarray  # success probability of a single trial
+    costs_per_try: np.ndarray
+    percentiles: np.ndarray  # shape (n_options, len(PERCENTILES)), number of tries
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, i):
+        return ChromaticResult(
+            self.names[i],
+            float(self.chances[i]),
+            int(self.costs_per_try[i]),
+            self.percentiles[i],
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def cost(self, at_percentile: str = "66"):
+        """Total cost of every option at the given percentile."""
+        return self.percentiles[:, _PCT_IDX[at_percentile]] * self.costs_per_try
+
+    def take(self, indices):
+        """A new `ChromaticResults` with only the options at `indices`, in that order."""
+        return ChromaticResults(
+            [self.names[i] for i in indices],
+            self.chances[indices],
+            self.costs_per_try[indices],
+            self.percentiles[indices],
+        )
+
+
+def color_chances(str_req: int, dex_req: int, int_req: int) -> np.ndarray:
+    """On-color and off-color chances for each attribute, in (str, dex, int) order."""
+    attrs = np.array([str_req, dex_req, int_req], dtype=np.float64)
+    on_color = attrs > 0
+    n_req = int(np.count_nonzero(on_color))
+
+    if n_req == 1:
+        hi_attr = attrs.max()  # the only requirement
+        on_chance = 0.9 * (hi_attr + 10) / (hi_attr + 20)
+        off_chance = (1 - on_chance) / 2
+        return np.where(on_color, on_chance, off_chance)
+    if n_req == 2:
+        # the primary attribute gets 0.9 * R1 / (R1 + R2), the secondary the rest of the 0.9
+        # and the off-color keeps a flat 0.1
+        return np.where(on_color, 0.9 * attrs / attrs.sum(), 0.1)
+    # triple requirements or no requirements (e.g. Dialla's Malefaction)
+    # all colors are equally probable
+    return np.full(3, 1 / 3)
 
 
 class ColorChances:
     """
     The class will compute the on-color and off-color chances for each attribute.
+
+    Thin wrapper around `color_chances` that allows lookups by attribute name.
     """
 
     def __init__(self, item):
-        _attr_names = ("str", "dex", "int")
-        # this will be used to sort the chances in the correct attribute order
-        # last element is max
-        sorted_attrs = sorted(zip(_attr_names, item), key=get(1))
-        # by default triple requirements or no requirements (e.g. Dialla's Malefaction)
-        # all colors are equally probable
-        self._chances = dict(zip(_attr_names, np.ones(3) / 3))
-        # for convenience
-        hi_attr = sorted_attrs[2][1]  # primary attribute
-        lo_attr = sorted_attrs[1][1]  # the "secondary" attribute
-
-        if item.n_req == 1:
-            on_chance = self._on_color_chance_1req(hi_attr)
-            off_chance = (1 - on_chance) / 2
-            # not very elegant but it werks
-            for (attr, _), p in zip(sorted_attrs, [off_chance, off_chance, on_chance]):
-                self._chances[attr] = p
-        elif item.n_req == 2:
-            on_chance = self._on_color_chance_2req(hi_attr, lo_attr)
-            for (attr, _), p in zip(sorted_attrs, [0.1, 0.9 - on_chance, on_chance]):
-                self._chances[attr] = p
-
-    def _on_color_chance_1req(self, R):
-        return 0.9 * (R + 10) / (R + 20)
-
-    def _on_color_chance_2req(self, R1, R2):
-        return 0.9 * R1 / (R1 + R2)
+        self._chances = dict(zip(("str", "dex", "int"), color_chances(*item)))
 
     def __iter__(self):
         for e in self._chances.values():
@@ -122,6 +235,46 @@ class ColorChances:
         return self._chances[key]
 
 
+@lru_cache(maxsize=512)
+def _compute_chances_cached(n_sockets, base_chances, desired_colors):
+    """Chance, cost and percentiles of every bench option, as `ChromaticResults`.
+
+    Arguments must be hashable so the results can be memoized: CLI sessions tend
+    to ask for the same base and colors over and over again.
+    """
+    # I will use this to tune the multinomial distribution
+    mods = _BENCH_MOD_ARRAY
+    # the chances were rounded to build the cache key, so make sure they add up to 1 again
+    p = np.array(base_chances)
+    p /= p.sum()
+
+    # multinomial distribution models the result of n trials with 3 possible outcomes.
+    # assuming that each socket is rolled independently of the rest, this means the number
+    # of trials is equal to the number of sockets. This is modified by "fixed" colors
+    # (bench crafting). All bench options are stacked and evaluated in one vectorized call,
+    # the ones fixing more sockets (or colors) than we have get a 0 chance.
+    chances = _multinomial_pmf(
+        np.array(desired_colors)[None, :] - mods,
+        n=n_sockets - mods.sum(axis=1),
+        p=p,
+    )
+    # once we have the chance of a particular outcome in the multinomial distribution,
+    # then the process of repeating this trial again and again until desired outcome
+    # follows a geometric distribution. We can use its inverse CDF to get the number of
+    # trials expected until you get the desired result with certain "surety".
+    all_percentiles = geom_ppf(PERCENTILES[None, :], chances[:, None])
+    # an impossible outcome never happens
+    all_percentiles[chances == 0] = np.inf
+
+    # the same object is handed out on every cache hit, so don't let anyone modify it
+    chances.setflags(write=False)
+    all_percentiles.setflags(write=False)
+
+    # remember I defined a dictionary with the costs given a "generic" bench option?
+    # those were looked up once at import time, in `_BENCH_COSTS`
+    return ChromaticResults(list(_BENCH_NAMES), chances, _BENCH_COSTS, all_percentiles)
+
+
 class ChromaticCalculator:
     """This is the easiest part once you realize socketing follows a
     multinomial distribution and the resulting chances computed via
@@ -131,71 +284,28 @@ class ChromaticCalculator:
     """
 
     def __init__(self, item, desired_socket_colors):
-        self._base_chances = np.array(list(ColorChances(item)))
+        self._base_chances = color_chances(*item)
         self._available_sockets = item.n_sockets
         self._desired_colors = np.array(desired_socket_colors)
 
-        # I will use this to tune the multinomial distribution
-        self._chromatic_options_modifiers = pipe(
-            # the 3 possible colors and the "null" color as 0, to get combinations like 1R
-            "rgb0",
-            # use combinatorics to get all possible combinations of 3 elements
-            # this will give tuples like ('r', 'r', '0') => 2R
-            lambda x: combinations_with_replacement(x, r=3),
-            # use counter to reduce combinations to counts
-            # e.g. ('r', 'r', 'g') => Count(r=2, g=1)
-            map(Counter),
-            # delete 0s from the counters keys
-            map(curry(delfn, key="0")),
-            # filter out the 1R1G1B combination, which doesn't exist for bench crafts (man, I wish)
-            filter(lambda x: not all(x[i] == 1 for i in "rgb")),
-            # transform to dictionaries (TODO: rework the RGb class to not need this)
-            map(dict),
-            # custom class to ease formatting and getting the colors
-            map(RGB),
-            # materialize in memory as a list
-            list,
-        )
+    @classmethod
+    def clear_cache(cls):
+        """Forget all memoized results (mostly useful for tests)."""
+        _compute_chances_cached.cache_clear()
 
     def compute_chances(self, sort_by_percentile: str = "66"):
         """The idea is to use a multidimensional Multinomial distribution, and use its probability mass function to
         get the exact chances of each result."""
-        # so basically I need to iterate over all crafting options.
-        # I will use a for-loop and try to be smart about it later.
-        results = []
-        for bench_opt in self._chromatic_options_modifiers:
-            as_np = np.array(list(bench_opt))
-            # multinomial distribution models the result of n trials with 3 possible outcomes.
-            # assuming that each socket is rolled independently of the rest, this means the number
-            # of trials is equal to the number of sockets. This is modified by "fixed" colors
-            # (bench crafting).
-            chance = multinomial.pmf(
-                self._desired_colors - as_np,
-                n=self._available_sockets - as_np.sum(),
-                p=self._base_chances,
-            )
-            # remember I defined a dictionary with the costs given a "generic" bench option?
-            cost = CHROMATIC_COSTS[tuple(sorted(bench_opt))]
-            # once we have the chance of a particular outcome in the multinomial distribution,
-            # then the process of repeating this trial again and again until desired outcome
-            # follows a geometric distribution. We can use its probability percentile function
-            # to get the number of trials expected until you get the desired result with certain "surety".
-            percentiles = geom.ppf([0.5, 0.66, 0.80, 0.9, 0.95, 0.99], chance)
-            results.append(
-                ChromaticResult(
-                    str(bench_opt),
-                    chance,
-                    cost,
-                    dict(zip(("50", "66", "80", "90", "99"), percentiles)),
-                )
-            )
-
-        return pipe(
-            results,
-            # 0% chance of success is uninteresting, filter them out
-            filter(lambda x: x.success_probability_single_trial > 0),
-            # sort by cost (least cost is better)
-            sorted(key=lambda x: x.cost(sort_by_percentile)),
-            # materialize
-            list,
+        # so basically I need to evaluate all crafting options. Rounding the base chances
+        # makes the cache key robust to floating point noise.
+        results = _compute_chances_cached(
+            self._available_sockets,
+            tuple(self._base_chances.round(12).tolist()),
+            tuple(self._desired_colors.tolist()),
         )
+
+        # sort by cost (least cost is better)
+        order = np.argsort(results.cost(sort_by_percentile), kind="stable")
+        # 0% chance of success is uninteresting, filter them out
+        keep = results.chances[order] > 0
+        return results.take(order[keep])
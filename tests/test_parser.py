@@ -3,3 +3,7 @@ from pypoe.cli import _parse_colors
 
 def test_single_parse():
     assert _parse_colors("1R2B") == [1, 0, 2]
+
+
+def test_full_parse():
+    assert _parse_colors("3R2G1B") == [3, 2, 1]
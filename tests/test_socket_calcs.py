@@ -0,0 +1,59 @@
+import numpy as np
+from scipy.stats import geom, multinomial
+
+from pypoe.socket_calcs import (
+    ChromaticCalculator,
+    Item,
+    PERCENTILES,
+    _compute_chances_cached,
+    _multinomial_pmf,
+    color_chances,
+    geom_ppf,
+    geom_sf,
+)
+
+
+def test_repeated_queries_hit_cache():
+    ChromaticCalculator.clear_cache()
+    item = Item(6, 6, str_req=100)
+    first = ChromaticCalculator(item, [3, 2, 1]).compute_chances()
+    second = ChromaticCalculator(item, [3, 2, 1]).compute_chances()
+    assert first.names == second.names
+    assert _compute_chances_cached.cache_info().hits == 1
+
+
+def test_color_chances():
+    assert np.allclose(color_chances(100, 0, 0), [0.825, 0.0875, 0.0875])
+    assert np.allclose(color_chances(0, 30, 60), [0.1, 0.3, 0.6])
+    assert np.allclose(color_chances(10, 10, 10), np.ones(3) / 3)
+
+
+def test_multinomial_pmf_matches_scipy():
+    p = color_chances(0, 30, 60)
+    x = np.array([[6, 0, 0], [1, 2, 3], [0, 2, 2], [2, 0, 4]])
+    n = np.array([6, 6, 4, 6])
+    assert np.allclose(_multinomial_pmf(x, n, p), multinomial.pmf(x, n=n, p=p))
+
+
+def test_multinomial_pmf_impossible_outcomes():
+    p = color_chances(0, 30, 60)
+    x = np.array([[-1, 3, 3], [1, 1, 1]])
+    n = np.array([5, 6])
+    assert np.array_equal(_multinomial_pmf(x, n, p), [0.0, 0.0])
+
+
+def test_result_cost_at_percentile():
+    result = ChromaticCalculator(Item(6, 6, str_req=100), [3, 2, 1]).compute_chances()[0]
+    for pct, q in zip(("50", "66", "80", "90", "95", "99"), PERCENTILES):
+        tries = np.ceil(np.log1p(-q) / np.log1p(-result.success_probability_single_trial))
+        assert result.cost(pct) == tries * result.cost_per_try
+
+
+def test_geom_ppf_matches_scipy():
+    p = np.geomspace(1e-10, 0.5, 200)[:, None]
+    assert np.array_equal(geom_ppf(PERCENTILES, p), geom.ppf(PERCENTILES, p))
+
+
+def test_geom_sf_matches_scipy():
+    p = np.geomspace(1e-10, 0.5, 200)
+    assert np.allclose(geom_sf(10, p), geom.sf(10, p), rtol=1e-12)